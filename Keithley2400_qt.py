@@ -7,33 +7,27 @@
 """
 
 import pyqtgraph as pg
-from functools import partial
+from pyqtgraph.Qt import QtCore, QtWidgets
+from functools import partial, lru_cache
+import numpy as np
 import pyvisa as visa
 from pyvisa.constants import StopBits, Parity
+from qasync import QEventLoop
+import asyncio
+import queue
 import os
 import time
-import keyboard
-
-rm = visa.ResourceManager()
-keithley = rm.open_resource("COM6", baud_rate=9600, data_bits=8, parity=Parity.none, stop_bits=StopBits.one)
-arduino = rm.open_resource("COM3", baud_rate = 9600)
-arduino.write("4")
-
-win = pg.GraphicsWindow(title="Signal from serial port") # creates a window
-p = win.addPlot(title="Realtime plot")  # creates empty space for the plot in the window
-curve = p.plot()    
 
 windowWidth = 500                       # width of the window displaying the curve
-Xm = linspace(0,0,windowWidth)          # create array that will contain the relevant time series     
-ptr = -windowWidth                      # set first x position
+REDRAW_INTERVAL = 0.1                   # minimum time between redraws (s), ~10Hz
 
-x = []
-y = []
+def low_latency(resource):               # only reachable through the pyvisa-py serial backend
+   try:
+      resource.visalib.sessions[resource.session].interface.set_low_latency_mode(True)
+   except (AttributeError, KeyError, ValueError, OSError):
+      pass
 
-#pw = pg.plot()
-#timer = pg.QtCore.QTimer()
-
-def keithley_setup():
+def keithley_setup(keithley):
    keithley.write("*RST") 
    keithley.write(":SOUR:FUNC VOLT")   
    keithley.write(":SOUR:VOLT:RANG:AUTO 1")
@@ -41,30 +35,159 @@ def keithley_setup():
    keithley.write(":SENS:CURR:RANG:AUTO 1")
    keithley.write(":FORM:ELEM CURR")   
    keithley.write(":SENS:CURR:PROT 1")   
-   keithley.write(":SOUR:DEL 0.5")
+   keithley.write(":SOUR:DEL 0.1")
+   keithley.write(":TRIG:COUN 1")
+   keithley.write(":ARM:COUN 1")
+
+def sweep_voltages(Vi, Vf, Vstep):
+   points = int(round((Vf - Vi) / Vstep)) + 1
+   return np.linspace(Vi, Vf, points, dtype=np.float32)
+
+@lru_cache(maxsize=4096)
+def volt_cmd(v, term):                  # set level and read in one transaction, encoded once per voltage
+   return f":SOUR:VOLT:LEV {v:.4f};:READ?{term}".encode('ascii')
+
+def level_commands(voltages, term):     # sent with write_raw
+   return [volt_cmd(round(float(v), 4), term) for v in voltages]
+
+def query_raw(keithley, cmd):
+   keithley.write_raw(cmd)
+   return keithley.read()
 
-                    # create an empty "plot" (a curve to plot)
+def keithley_sweep_setup(keithley, Vi, Vf, Vstep):    # on-instrument linear sweep
+   points = len(sweep_voltages(Vi, Vf, Vstep))
+   keithley_setup(keithley)
+   keithley.write(":SOUR:VOLT:MODE SWE")
+   keithley.write(":SOUR:VOLT:STAR " + str(Vi))
+   keithley.write(":SOUR:VOLT:STOP " + str(Vf))
+   keithley.write(":SOUR:VOLT:STEP " + str(Vstep))
+   keithley.write(":TRIG:COUN " + str(points))
+   keithley.write(":FORM:DATA REAL,32")           # IEEE-754 binary instead of ASCII
+   keithley.write(":FORM:BORD NORM")              # big-endian, as read back below
+   return points
 
-def update():
-   x = []
-   y = []
+def keithley_sweep_read(keithley, points):
+   keithley.write(":OUTP ON")
+   # the 2400 sends an indefinite-length #0 header, the length comes from data_points
+   data = keithley.query_binary_values(":READ?", datatype='f', is_big_endian=True, container=np.ndarray,
+                                       data_points=points)
+   keithley.write(":OUTP OFF")
+   return data
+
+async def sweep(keithley, readings, abort):
    Vi = 0
    Vf = 1
    Vstep = 0.1
-   keithley_setup()     
-   keithley.write(":SOUR:VOLT:LEV 0")
-   keithley.write(":OUTP ON")    
-   while (Vi <= Vf):
-      if keyboard.is_pressed("Escape"):
+   voltages = sweep_voltages(Vi, Vf, Vstep)
+   cmds = level_commands(voltages, keithley.write_termination)
+   await asyncio.to_thread(keithley_setup, keithley)     # VISA I/O runs in a worker thread
+   await asyncio.to_thread(keithley.write, ":SOUR:VOLT:LEV " + str(Vi))
+   await asyncio.to_thread(keithley.write, ":OUTP ON")
+   try:
+      for V, cmd in zip(voltages, cmds):
+         if abort.is_set():
             break
-      meas = keithley.query(":MEAS?")      
-      x.append(Vi)             
-      y.append(float(meas))
-      pw.plot(x, y, clear=True)
-      Vi += Vstep      
-      keithley.write(":SOUR:VOLT:LEV " + str(Vi))   
-   keithley.write(":OUTP OFF")
-   keithley.write(":SOUR:VOLT:LEV 0")
-    
-timer.timeout.connect(update)
-timer.start(16)
+         meas = await asyncio.to_thread(query_raw, keithley, cmd)
+         readings.put((V, float(meas)))
+   finally:
+      await asyncio.to_thread(keithley.write, ":OUTP OFF")
+      await asyncio.to_thread(keithley.write, ":SOUR:VOLT:LEV 0")
+
+async def fast_sweep(keithley, readings, abort):   # whole sweep in a single transfer, no live update
+   Vi = 0
+   Vf = 1
+   Vstep = 0.1
+   points = await asyncio.to_thread(keithley_sweep_setup, keithley, Vi, Vf, Vstep)
+   data = await asyncio.to_thread(keithley_sweep_read, keithley, points)
+   for V, I in zip(sweep_voltages(Vi, Vf, Vstep), data):
+      readings.put((V, I))
+
+def main():
+   app = pg.mkQApp()
+   loop = QEventLoop(app)               # Qt and asyncio share the same event loop
+   asyncio.set_event_loop(loop)
+
+   rm = visa.ResourceManager()
+   keithley = rm.open_resource("COM6", baud_rate=9600, data_bits=8, parity=Parity.none, stop_bits=StopBits.one)
+   keithley.chunk_size = 102400         # a whole sweep arrives in one low-level read
+   keithley.timeout = 25000
+   low_latency(keithley)
+   arduino = rm.open_resource("COM3", baud_rate = 9600)
+   arduino.write("4")
+
+   win = pg.GraphicsLayoutWidget(title="Signal from serial port") # creates the plot widget
+   p = win.addPlot(title="Realtime plot")  # creates empty space for the plot in the window
+   curve = p.plot(pen='y')              # single PlotDataItem, updated with setData
+   curve.setDownsampling(auto=True)     # skip rendering subpixel points
+   curve.setClipToView(True)
+
+   sweep_button = QtWidgets.QPushButton("Sweep")
+   fast_sweep_button = QtWidgets.QPushButton("Fast sweep")
+   stop_button = QtWidgets.QPushButton("Stop")
+   panel = QtWidgets.QWidget()
+   layout = QtWidgets.QVBoxLayout(panel)
+   layout.addWidget(win)
+   layout.addWidget(sweep_button)
+   layout.addWidget(fast_sweep_button)
+   layout.addWidget(stop_button)
+   panel.show()
+
+   X = np.empty(windowWidth, dtype=np.float32)   # preallocated voltage buffer
+   Y = np.empty(windowWidth, dtype=np.float32)   # preallocated current buffer
+   n = 0                                # number of readings written so far
+   last_draw = time.monotonic()
+
+   readings = queue.Queue()             # (V, I) pairs from the sweep coroutine to the plot
+   abort = asyncio.Event()              # cancellation token for the running sweep
+   sweep_task = None
+
+   timer = pg.QtCore.QTimer()
+
+   def start_sweep(coro):
+      nonlocal sweep_task, n
+      if sweep_task is not None and not sweep_task.done():
+         return
+      n = 0
+      abort.clear()
+      sweep_task = asyncio.create_task(coro(keithley, readings, abort))
+
+   def key_press(ev):                   # Escape aborts the running sweep
+      if ev.key() == QtCore.Qt.Key.Key_Escape:
+         abort.set()
+      else:
+         QtWidgets.QWidget.keyPressEvent(panel, ev)
+
+   def update():                        # only drains the queue and redraws
+      nonlocal last_draw, n
+      while True:
+         try:
+            V, I = readings.get_nowait()
+         except queue.Empty:
+            break
+         idx = n % windowWidth          # wraps around for long acquisitions
+         X[idx] = V
+         Y[idx] = I
+         n += 1
+      now = time.monotonic()
+      if now - last_draw > REDRAW_INTERVAL:
+         m = min(n, windowWidth)
+         curve.setData(X[:m], Y[:m])
+         last_draw = now
+
+   sweep_button.clicked.connect(lambda: start_sweep(sweep))
+   fast_sweep_button.clicked.connect(lambda: start_sweep(fast_sweep))
+   stop_button.clicked.connect(abort.set)
+   panel.keyPressEvent = key_press
+   timer.timeout.connect(update)
+   timer.start(100)
+
+   try:
+      with loop:
+         loop.run_forever()
+   finally:
+      arduino.close()
+      keithley.close()
+      rm.close()
+
+if __name__ == '__main__':
+   main()
@@ -6,7 +6,9 @@
 """
 
 import serial
-import time
+
+INIT_SETUP = b'\r' + b'I' + b'EC;0' + b'H;1' + b'X;0' + b'TC;2' + b'TB;4'
+INIT_CLEAR = b'C' + b'OA;09;IFC'
 
 ser = serial.Serial(timeout=10)
 
@@ -20,21 +22,16 @@ ser.rtscts = True
 
 ser.open()
 
-for i in range(5):
-    ser.write(b'\r')
-    time.sleep(0.1)
-
-    ser.write(b'I')
-    ser.write(b'EC;0')
-    ser.write(b'H;1')
-    ser.write(b'X;0')
-    ser.write(b'TC;2')
-    ser.write(b'TB;4')
+try:
+    ser.set_low_latency_mode(True)    # ASYNC_LOW_LATENCY on USB-serial adapters, POSIX only
+except (AttributeError, ValueError, OSError):
+    pass
 
-    time.sleep(0.5)
-
-    ser.write(b'C')
+for i in range(5):
+    ser.write(INIT_SETUP)
+    ser.flush()
 
-    ser.write(b'OA;09;IFC')
+    ser.write(INIT_CLEAR)
+ser.flush()
 
 #ser.close()
@@ -0,0 +1,64 @@
+# encoding: utf-8
+
+""" 
+    Author: Marcelo Meira Faleiros
+    State University of Campinas, Brazil
+
+"""
+
+import collections
+import threading
+import time
+
+class BackgroundReader():
+    '''
+    Background poller that keeps only the most recent reading.
+
+    The instrument is read at a fixed rate from a daemon thread, so a caller
+    polling in a loop gets the latest value at once instead of blocking on
+    GPIB/RS232 for every call.
+
+    Usage
+    -----
+    from background_reader import BackgroundReader
+    reader = BackgroundReader(read_function, rate_hz=10)
+    y = reader.latest()
+    reader.stop()
+
+    If read_function raises (e.g. a timeout), polling stops and latest()
+    raises that exception. read_function must hold the driver's I/O lock,
+    so the poll never interleaves with the driver's other calls.
+    '''
+
+    def __init__(self, read, rate_hz):
+        self.read = read
+        self.period = 1 / rate_hz
+        self._latest = collections.deque(maxlen=1)       #older readings are dropped
+        self._error = None                               #exception that ended the polling thread
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def latest(self, timeout=30):
+        if not self._ready.wait(timeout):                #blocks only until the first reading
+            raise TimeoutError('no reading within %g s' % timeout)
+        if self._error is not None:
+            raise self._error                            #no stale value once the instrument failed
+        return self._latest[0]
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            try:
+                self._latest.append(self.read())
+            except Exception as e:
+                self._error = e
+                self._ready.set()                        #wake a latest() still waiting for the first reading
+                return
+            self._ready.set()
+            self._stop.wait(max(0, self.period - (time.monotonic() - t0)))
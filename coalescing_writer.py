@@ -0,0 +1,82 @@
+# encoding: utf-8
+
+""" 
+    Author: Marcelo Meira Faleiros
+    State University of Campinas, Brazil
+
+"""
+
+import threading
+
+class CoalescingWriter():
+    '''
+    Background writer for set-and-forget commands (setpoints, ranges).
+
+    Commands are stored by key and only the latest one per key is written,
+    so a burst of updates (e.g. from a GUI slider) reaches the instrument as
+    a single write instead of queueing every intermediate value on the bus.
+
+    Usage
+    -----
+    from coalescing_writer import CoalescingWriter
+    writer = CoalescingWriter(resource, io_lock)
+    writer.submit('SETP', b'SETP 1,300\r\n')
+    writer.flush()                                       #waits until written, raises a failed write
+
+    io_lock is the lock the driver holds around its own write/read exchanges
+    on the same resource, so a queued write never lands between a query and
+    its reply. If a write fails, the exception is kept and raised by the
+    next submit() or flush(); the writer keeps running.
+    '''
+
+    def __init__(self, resource, io_lock):
+        self.resource = resource
+        self.io_lock = io_lock
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._idle = threading.Event()                   #set while nothing is pending or being written
+        self._idle.set()
+        self._error = None                               #exception of a failed write, not yet reported
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, command, done=None):           #done() is called once the command is written
+        self._raise_error()
+        with self._lock:
+            self._pending[key] = (command, done)         #replaces any command not yet written
+            self._idle.clear()
+        self._event.set()
+
+    def flush(self, timeout=None):
+        if not self._idle.wait(timeout):
+            raise TimeoutError('pending commands not written within %g s' % timeout)
+        self._raise_error()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def discard(self, key):                              #call with io_lock held, before a direct write of the same key
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _run(self):
+        while True:
+            self._event.wait()
+            with self.io_lock:                           #taken before the swap, so discard() and direct writes stay ordered
+                with self._lock:
+                    pending, self._pending = self._pending, {}
+                    self._event.clear()
+                for command, done in pending.values():
+                    try:
+                        self.resource.write_raw(command)
+                    except Exception as e:
+                        self._error = e                  #reported to the caller, the thread stays alive
+                        continue
+                    if done is not None:
+                        done()                           #still under io_lock, ordered with direct writes
+                with self._lock:
+                    if not self._pending:
+                        self._idle.set()
@@ -6,9 +6,131 @@
 
 """
 
-import pyvisa as visa
+from visa_rm import get_rm
 import time
 
+#command tables, pre-encoded so they can be sent with write_raw
+
+FUNCTION = {
+    'Volts - dc': b'F0,0X',
+    'Volts - sweep': b'F0,1X',
+    'Amps - dc': b'F1,0X',
+    'Amps - sweep': b'F1,1X'
+}
+
+VOLTS_RANGE = {
+    'Auto': b'0',
+    '1.1V': b'1',
+    '11V': b'2',
+    '110V': b'3'
+}
+
+AMPS_RANGE = {
+    'Auto': b'0',
+    '1nA': b'1',
+    '10nA': b'2',
+    '100nA': b'3',
+    '1uA': b'4',
+    '10uA': b'5',
+    '100uA': b'6',
+    '1mA': b'7',
+    '10mA': b'8',
+    '100mA': b'9',
+    '1A': b'10'
+}
+
+OUTPUT_ITEMS = {
+    'No items': b'G0,',
+    'Source value': b'G1,',
+    'Delay value': b'G2,',
+    'Measure value': b'G4,',
+    'Time value': b'G8,'
+}
+
+OUTPUT_FORMAT = {
+    'ASCII with prefix and suffix': b'0,',
+    'ASCII with prefix, no suffix': b'1,',
+    'ASCII, no prefix or suffix': b'2,',
+    'HP binary data': b'3,',
+    'IBM binary data': b'4,'
+}
+
+OUTPUT_LINES = {
+    'One line of dc data per talk': b'0X',
+    'One line of sweep data per talk': b'1X',
+    'All lines of sweep data per talk': b'2X'
+}
+
+SELF_TESTS = {
+    'Restore factory defaults': b'J0X',
+    'Perform memory test': b'J1X',
+    'Perform display test': b'J2X'
+}
+
+SRQ_MASK = {
+    'SRQ disabled': b'0',
+    'Warning': b'1',
+    'Sweep done': b'2',
+    'Trigger out': b'4',
+    'Reading done': b'8',
+    'Ready for trigger': b'16',
+    'Error': b'32',
+    'Compliance': b'128'
+}
+
+FILTER_MODE = {
+    'Disabled': b'P0X',
+    '2 readings': b'P1X',
+    '4 readings': b'P2X',
+    '8 readings': b'P3X',
+    '16 readings': b'P4X',
+    '32 readings': b'P5X'
+}
+
+INTEGRATION_TIME = {
+    'Fast': b'S0X',
+    'Medium': b'S1X',
+    'LineCycle (60Hz)': b'S2X',
+    'LineCycle (50Hz)': b'S3X'
+}
+
+TRIGGER_ORIGIN = {
+    'IEEE X': b'0',
+    'IEEE GET': b'1',
+    'IEEE Talk': b'2',
+    'External (TRIGGER IN pulse)': b'3',
+    'Immediate only (front panel MANUAL key or H0X command': b'4'
+}
+
+TRIGGER_IN = {
+    'Continuous': b'0',
+    '^SRC DLY MSR (trigger starts source phase)': b'1',
+    'SRC^DLY MSR (trigger starts delay phase)': b'2',
+    '^SRC^DLY MSR': b'3',
+    'SRC DLY^MSR (trigger starts measure phase)': b'4',
+    '^SRC DLY^MSR': b'5',
+    'SRC^DLY^MSR': b'6',
+    '^SRC^DLY^MSR': b'7',
+    '^Single pulse': b'8'
+}
+
+TRIGGER_OUT = {
+    'None during sweep': b'0',
+    'SRC^DLY MSR': b'1',
+    'SRC DLY^MSR': b'2',
+    'SRC^DLY^MSR': b'3',
+    'SRC DLY MSR^': b'4',
+    'SRC^DLY MSR^': b'5',
+    'SRC DLY^MSR^': b'6',
+    'SRC^DLY^MSR^': b'7',
+    'Pulse end^': b'8'
+}
+
+TRIGGER_END = {
+    'Disabled': b'0',
+    'Enabled': b'1'
+}
+
 class Keithley236():
     
     '''
@@ -170,154 +292,65 @@ class Keithley236():
     k = kt.Keithley236()
     k.gpib_set_up()
     k.run(5, 0.5, 0.1)
+    iv = k.run_sweep(0, 5, 0.5, 100, 0.1)
 
     '''
 
-    function = dict([
-        ('Volts - dc', 'F0,0X'),
-        ('Volts - sweep', 'F0,1X'),
-        ('Amps - dc','F1,0X'),
-        ('Amps - sweep', 'F1,1X')
-    ])
-
-    volts_range = dict([
-        ('Auto', '0'),
-        ('1.1V', '1'),
-        ('11V', '2'),
-        ('110V', '3'),
-    ])
+    function = FUNCTION
+
+    volts_range = VOLTS_RANGE
     
-    amps_range = dict([
-        ('Auto', '0'),
-        ('1nA', '1'), 
-        ('10nA', '2'), 
-        ('100nA', '3'), 
-        ('1uA', '4'), 
-        ('10uA', '5'),        
-        ('100uA', '6'),
-        ('1mA', '7'),
-        ('10mA', '8'),
-        ('100mA', '9'),
-        ('1A', '10')
-    ])
-
-    output_items = dict([
-        ('No items', 'G0,'),
-        ('Source value', 'G1,'),
-        ('Delay value', 'G2,'),
-        ('Measure value', 'G4,'),
-        ('Time value', 'G8,')    
-    ])
-
-    output_format = dict([
-        ('ASCII with prefix and suffix', '0,'),
-        ('ASCII with prefix, no suffix', '1,'),
-        ('ASCII, no prefix or suffix', '2,'),
-        ('HP binary data', '3,'),
-        ('IBM binary data', '4,')    
-    ])
-
-    output_lines = dict([
-        ('One line of dc data per talk', '0X'),
-        ('One line of sweep data per talk', '1X'),
-        ('All lines of sweep data per talk', '2X')
-    ])
-
-    self_tests = dict([
-        ('Restore factory defaults', 'J0X'),
-        ('Perform memory test', 'J1X'),
-        ('Perform display test', 'J2X')
-    ])
-
-    SRQ_mask = dict([
-        ('SRQ disabled', '0'),
-        ('Warning', '1'),
-        ('Sweep done', '2'),
-        ('Trigger out', '4'),
-        ('Reading done', '8'),
-        ('Ready for trigger', '16'),
-        ('Error', '32'),
-        ('Compliance', '128')
-    ])
-
-    filter_mode = dict([
-        ('Disabled', 'P0X'),
-        ('2 readings', 'P1X'),
-        ('4 readings', 'P2X'),
-        ('8 readings', 'P3X'),
-        ('16 readings', 'P4X'),
-        ('32 readings', 'P5X')        
-    ])
-
-    integration_time = dict([
-        ('Fast', 'S0X'),
-        ('Medium', 'S1X'),
-        ('LineCycle (60Hz)', 'S2X'),
-        ('LineCycle (50Hz)', 'S3X')               
-    ])
-
-    trigger_origin = dict([
-        ('IEEE X', '0'),
-        ('IEEE GET', '1' ),
-        ('IEEE Talk', '2'),
-        ('External (TRIGGER IN pulse)', '3'),
-        ('Immediate only (front panel MANUAL key or H0X command', '4') 
-    ])
-
-    trigger_in = dict([
-        ('Continuous', '0'),
-        ('^SRC DLY MSR (trigger starts source phase)', '1'),
-        ('SRC^DLY MSR (trigger starts delay phase)', '2'),
-        ('^SRC^DLY MSR', '3'),
-        ('SRC DLY^MSR (trigger starts measure phase)', '4'),
-        ('^SRC DLY^MSR', '5'),
-        ('SRC^DLY^MSR', '6'),
-        ('^SRC^DLY^MSR', '7'),
-        ('^Single pulse', '8')
-    ])
-
-    trigger_out = dict([
-        ('None during sweep', '0'),
-        ('SRC^DLY MSR', '1'),
-        ('SRC DLY^MSR', '2'),
-        ('SRC^DLY^MSR', '3'),
-        ('SRC DLY MSR^', '4'),
-        ('SRC^DLY MSR^', '5'),
-        ('SRC DLY^MSR^', '6'),
-        ('SRC^DLY^MSR^', '7'),
-        ('Pulse end^', '8')
-    ])
-
-    trigger_end = dict([
-        ('Disabled', '0'),
-        ('Enabled', '1')
-    ])
+    amps_range = AMPS_RANGE
+
+    output_items = OUTPUT_ITEMS
+
+    output_format = OUTPUT_FORMAT
+
+    output_lines = OUTPUT_LINES
+
+    self_tests = SELF_TESTS
+
+    SRQ_mask = SRQ_MASK
+
+    filter_mode = FILTER_MODE
+
+    integration_time = INTEGRATION_TIME
+
+    trigger_origin = TRIGGER_ORIGIN
+
+    trigger_in = TRIGGER_IN
+
+    trigger_out = TRIGGER_OUT
+
+    trigger_end = TRIGGER_END
 
     def __init__(self):
         self.brand = 'Keithley'
         self.model = '236'
+        self.bias_commands = {}                                 #encoded bias commands, reused across sweeps
         
     def gpib_set_up(self):
-        self.rm = visa.ResourceManager()
+        self.rm = get_rm()
         resources = self.rm.list_resources()
-        if 'GPIB0::16' not in str(resources):
-                rsrcs = "not connected"
-        else:
-            for i in range(len(resources)):
-                if 'GPIB0::16' in resources[i]:
-                    rsrcs = resources[i]
-                    self.keithley236 = self.rm.open_resource(rsrcs)
-                    self.keithley236.timeout = 25000
+        rsrcs = next((r for r in resources if 'GPIB0::16' in r), None)
+        if rsrcs is None:
+            return "not connected"
+        self.keithley236 = self.rm.open_resource(rsrcs)
+        self.keithley236.timeout = 25000
+        self.keithley236.chunk_size = 32768          #reading arrives in a single bulk read
+        self.keithley236.read_termination = '\n'
         return rsrcs
             
     def start_up(self, meter_mode, average, int_time):
-        self.keithley236.write(self.function[meter_mode])       #set function                  
-        self.keithley236.write(self.filter_mode[average])       #set filter                      
-        self.keithley236.write(self.integration_time[int_time])
-        output_info = self.output_items['Measure value'] + self.output_format['ASCII, no prefix or suffix'] + self.output_lines['One line of dc data per talk']                         
-        self.keithley236.write(output_info)             #output data format
-        self.keithley236.write('O0X')                           #set local sense  
-        self.keithley236.write('N1X')
+        output_info = OUTPUT_ITEMS['Measure value'] + OUTPUT_FORMAT['HP binary data'] + OUTPUT_LINES['One line of dc data per talk']
+        command = (FUNCTION[meter_mode][:-1]                    #set function
+                   + FILTER_MODE[average][:-1]                  #set filter
+                   + INTEGRATION_TIME[int_time][:-1]
+                   + output_info[:-1]                           #output data format
+                   + b'O0'                                      #set local sense
+                   + b'N1'
+                   + b'X')                                      #all executed together on X
+        self.keithley236.write_raw(command)
                 
     def stand_by(self):
         self.keithley236.write('N0X')
@@ -330,8 +363,23 @@ class Keithley236():
         
     def run(self, volts, delay, compliance):
         self.keithley236.write('L' + str(compliance) + ',0X')   #set compliance 
-        bias_command = 'B' + str(volts) + ',0,' + str(delay)
-        self.keithley236.write(bias_command)                       #set bias 
-        y = float(self.keithley236.query('H0X'))
+        bias_command = self.bias_commands.get((volts, delay))
+        if bias_command is None:
+            bias_command = ('B' + str(volts) + ',0,' + str(delay)).encode('ascii')
+            self.bias_commands[(volts, delay)] = bias_command
+        self.keithley236.write_raw(bias_command)                   #set bias 
+        y = self.keithley236.query_binary_values('H0X', datatype='f', is_big_endian=True, header_fmt='hp')[0]
         
         return y
+
+    def run_sweep(self, start, stop, step, delay, compliance):
+        self.keithley236.write_raw(FUNCTION['Volts - sweep'])           #V-source sweep
+        self.keithley236.write('L' + str(compliance) + ',0X')           #set compliance
+        sweep_command = 'Q1,' + str(start) + ',' + str(stop) + ',' + str(step) + ',0,' + str(delay) + 'X'
+        self.keithley236.write(sweep_command)                          #create linear stair sweep
+        output_info = OUTPUT_ITEMS['Measure value'] + OUTPUT_FORMAT['HP binary data'] + OUTPUT_LINES['All lines of sweep data per talk']
+        self.keithley236.write_raw(output_info)                        #whole sweep in one talk
+        self.keithley236.write('N1X')
+        y = self.keithley236.query_binary_values('H0X', datatype='f', is_big_endian=True, header_fmt='hp')
+
+        return y
@@ -7,7 +7,9 @@
 """
 
 import serial
-import time
+
+INIT_SETUP = b'\r' + b'I' + b'EC;0' + b'H;1' + b'X;0' + b'TC;2' + b'TB;4'   #initialization string sent in a single write
+INIT_CLEAR = b'C' + b'OA;09;IFC'
 
 class Keithley500():
     def __init__(self):
@@ -24,24 +26,40 @@ class Keithley500():
         self.ser.rtscts = True
 
         self.ser.open()
+        self.low_latency()
+
+    def low_latency(self):                    #1 ms instead of 16 ms latency timer on USB-serial adapters
+        try:
+            self.ser.set_low_latency_mode(True)   #ASYNC_LOW_LATENCY, only available on POSIX
+        except (AttributeError, ValueError, OSError):
+            pass
 
     def initialize_keithley500(self):
         for i in range(5):
-            self.ser.write(b'\r')
-            time.sleep(0.1)
+            self.ser.write(INIT_SETUP)
+            self.ser.flush()                    #wait for the setup string to leave the port
 
-            self.ser.write(b'I')
-            self.ser.write(b'EC;0')
-            self.ser.write(b'H;1')
-            self.ser.write(b'X;0')
-            self.ser.write(b'TC;2')
-            self.ser.write(b'TB;4')
+            self.ser.write(INIT_CLEAR)
+        self.ser.flush()
 
-            time.sleep(0.5)
+    async def initialize_keithley500_async(self):
+        import serial_asyncio                   #optional, only needed for the asyncio path
+        if self.ser.is_open:
+            self.ser.close()                    #the asyncio transport opens its own handle
+        reader, writer = await serial_asyncio.open_serial_connection(url=self.ser.port, baudrate=9600, bytesize=8,
+                                                                     parity='N', stopbits=2, dsrdtr=True, rtscts=True)
+        try:
+            for i in range(5):
+                writer.write(INIT_SETUP)
+                await writer.drain()                #the 500 sends no reply, same pacing as the blocking flush()
 
-            self.ser.write(b'C')
-
-            self.ser.write(b'OA;09;IFC')
+                writer.write(INIT_CLEAR)
+                await writer.drain()
+        finally:
+            writer.close()
+            await writer.wait_closed()          #close() only schedules it, the handle must be free before reopening
+        self.ser.open()
+        self.low_latency()                      #the reopened handle starts with the default latency timer
 
     def close_rs232(self):
         self.ser.close()
@@ -5,8 +5,11 @@
     
 """
 
-import pyvisa as visa
+from visa_rm import get_rm
+from coalescing_writer import CoalescingWriter
+from background_reader import BackgroundReader
 import serial
+import threading
 import time
 
 class Keithley617():
@@ -136,198 +139,226 @@ class Keithley617():
     k617 = ktl617.Keithley617()
     k617.comm_setup()
     k617.start_up_auto_config('Voltmeter')
+    k617.zero_correction()
     k617.run()
 
     '''
 
-    function = dict([
-        ('Volts', 'F0'),      
-        ('Amps','F1'),   
-        ('Ohms', 'F2'),      
-        ('Coulombs', 'F3'), 
-        ('External_feedback', 'F4'), 
-        ('V/I Ohms', 'F5')
-    ])
-
-    volts_range = dict([
-        ('Auto', 'R0'),
-        ('200 mV', 'R1'),
-        ('2 V', 'R2'),
-        ('20 V', 'R3'),
-        ('200 V', 'R4'),        
-        ('Cancel Autoranging', 'R12')
-    ])
+    function = {
+        'Volts': b'F0',      
+        'Amps': b'F1',   
+        'Ohms': b'F2',      
+        'Coulombs': b'F3', 
+        'External_feedback': b'F4', 
+        'V/I Ohms': b'F5'
+    }
+
+    #start_up_auto_config strings: function, autorange, zero check/correct off, baseline off,
+    #electrometer display/reading, data store off, no prefix, one-shot trigger by X, no SRQ
+    _CFG = {
+        'Coulombmeter': b'F3R0C0Z0N0D0B0Q7G1T5M0X',
+        'Voltmeter': b'F0R0C0Z0N0D0B0Q7G1T5M0X',
+        'Ohmmeter': b'F2R0C0Z0N0D0B0Q7G1T5M0X',
+        'Amperemeter': b'F1R0C0Z0N0D0B0Q7G1T5M0X'
+    }
+
+    volts_range = {
+        'Auto': b'R0',
+        '200 mV': b'R1',
+        '2 V': b'R2',
+        '20 V': b'R3',
+        '200 V': b'R4',        
+        'Cancel Autoranging': b'R12'
+    }
     
-    amps_range = dict([
-        ('Auto', 'R0'),
-        ('2 pA', 'R1'), 
-        ('20 pA', 'R2'), 
-        ('200 pA', 'R3'), 
-        ('2 nA', 'R4'), 
-        ('20 nA', 'R5'),
-        ('200 nA', 'R6'),
-        ('2 uA', 'R7'), 
-        ('20 uA', 'R8'),
-        ('200 uA', 'R9'),
-        ('2 mA', 'R10'), 
-        ('20 mA', 'R11'),
-        ('Cancel Autoranging', 'R12')        
-    ])
-
-    ohms_range = dict([
-        ('Auto', 'R0'),
-        ('2 kΩ', 'R1'), 
-        ('20 kΩ', 'R2'), 
-        ('200 kΩ', 'R3'), 
-        ('2 MΩ', 'R4'), 
-        ('20 MΩ', 'R5'),
-        ('200 MΩ', 'R6'),
-        ('2 GΩ', 'R7'),
-        ('20 GΩ', 'R8'),
-        ('200 GΩ', 'R9'),   
-        ('Cancel Autoranging', 'R12')      
-    ])
-
-    coulombs_range = dict([
-        ('Auto', 'R0'),
-        ('200 pC', 'R1'), 
-        ('2 nC', 'R2'), 
-        ('20 nC', 'R3'),         
-        ('Cancel Autoranging', 'R12')       
-    ])
-
-    zero_check = dict([
-        ('Off', 'C0'),
-        ('On', 'C1')    
-    ])
-
-    zero_correct = dict([
-        ('Disabled', 'Z0'),
-        ('Enabled', 'Z1')
-    ])
-
-    baseline_suppression = dict([
-        ('Disabled', 'N0'),
-        ('Enabled', 'N1')
-    ])
-
-    display_mode = dict([
-        ('Electrometer', 'D0'),
-        ('Voltage source', 'D1')
-    ])
-
-    reading_mode = dict([
-        ('Electrometer', 'B0'),
-        ('Buffer reading', 'B1'),
-        ('Maximum reading', 'B2'),
-        ('Minimum reading', 'B3'),
-        ('Voltage source', 'B4')
-    ])
-
-    data_store = dict([
-        ('Conversion rate', 'Q0'),
-        ('One reading per second', 'Q1'),
-        ('One reading every 10 seconds', 'Q2'),
-        ('One reading per minute', 'Q3'),
-        ('One reading every 10 minutes', 'Q4'),
-        ('One reading per hour', 'Q5'),
-        ('Trigger mode', 'Q6'),
-        ('Disabled', 'Q7')
-    ])
-
-    data_format = dict([
-        ('With prefix', 'G0'),
-        ('Without prefix', 'G1'),
-        ('with prefix and buffer suffix', 'G2') 
-    ])
-
-    trigger_mode = dict([
-        ('Continuous trigger by talk', 'T0'),
-        ('One-shot trigger by talk', 'T1'),
-        ('Continuous trigger by GET', 'T2'),
-        ('One-shot trigger by GET', 'T3'),
-        ('Continuous trigger by X', 'T4'),
-        ('One-shot trigger by X', 'T5'),
-        ('Continuous trigger by external trigger', 'T6'),
-        ('One-shot trigger by external trigger', 'T7')
-    ])
-
-    srq = dict([
-        ('Disable SRQ', 'M0'),
-        ('Reading overflow', 'M1'),
-        ('Buffer full', 'M2'),
-        ('Reading done', 'M8'),
-        ('Ready', 'M16'),
-        ('Error', 'M32')
-    ])
-
-    eoi_and_bus_holdoff = dict([
-        ('Enable EOI and bus holdoff_on_X', 'K0'),
-        ('Disable EOI Enable bus holdoff on X', 'K1'),
-        ('Enable EOI disable bus holdoff on X', 'K2'),
-        ('Disable EOI and bus holdoff on X', 'K3')
-    ])
-
-    terminator = dict([
-        ('LF CR', 'Y(LF CR)'),
-        ('CR LF', 'Y(CR LF)'),
-        ('ASCII character', 'Y(ASCII)'),
-        ('No terminator', 'YX')
-    ])
-
-    status_word = dict([
-        ('Send status format', 'U0'),
-        ('Error conditions', 'U1'),
-        ('Data conditions', 'U2')
-    ])
+    amps_range = {
+        'Auto': b'R0',
+        '2 pA': b'R1', 
+        '20 pA': b'R2', 
+        '200 pA': b'R3', 
+        '2 nA': b'R4', 
+        '20 nA': b'R5',
+        '200 nA': b'R6',
+        '2 uA': b'R7', 
+        '20 uA': b'R8',
+        '200 uA': b'R9',
+        '2 mA': b'R10', 
+        '20 mA': b'R11',
+        'Cancel Autoranging': b'R12'        
+    }
+
+    ohms_range = {
+        'Auto': b'R0',
+        '2 kΩ': b'R1', 
+        '20 kΩ': b'R2', 
+        '200 kΩ': b'R3', 
+        '2 MΩ': b'R4', 
+        '20 MΩ': b'R5',
+        '200 MΩ': b'R6',
+        '2 GΩ': b'R7',
+        '20 GΩ': b'R8',
+        '200 GΩ': b'R9',   
+        'Cancel Autoranging': b'R12'      
+    }
+
+    coulombs_range = {
+        'Auto': b'R0',
+        '200 pC': b'R1', 
+        '2 nC': b'R2', 
+        '20 nC': b'R3',         
+        'Cancel Autoranging': b'R12'       
+    }
+
+    zero_check = {
+        'Off': b'C0',
+        'On': b'C1'    
+    }
+
+    zero_correct = {
+        'Disabled': b'Z0',
+        'Enabled': b'Z1'
+    }
+
+    baseline_suppression = {
+        'Disabled': b'N0',
+        'Enabled': b'N1'
+    }
+
+    display_mode = {
+        'Electrometer': b'D0',
+        'Voltage source': b'D1'
+    }
+
+    reading_mode = {
+        'Electrometer': b'B0',
+        'Buffer reading': b'B1',
+        'Maximum reading': b'B2',
+        'Minimum reading': b'B3',
+        'Voltage source': b'B4'
+    }
+
+    data_store = {
+        'Conversion rate': b'Q0',
+        'One reading per second': b'Q1',
+        'One reading every 10 seconds': b'Q2',
+        'One reading per minute': b'Q3',
+        'One reading every 10 minutes': b'Q4',
+        'One reading per hour': b'Q5',
+        'Trigger mode': b'Q6',
+        'Disabled': b'Q7'
+    }
+
+    data_store_period = {                      #seconds between stored readings
+        'One reading per second': 1,
+        'One reading every 10 seconds': 10,
+        'One reading per minute': 60,
+        'One reading every 10 minutes': 600,
+        'One reading per hour': 3600
+    }
+
+    data_format = {
+        'With prefix': b'G0',
+        'Without prefix': b'G1',
+        'with prefix and buffer suffix': b'G2' 
+    }
+
+    trigger_mode = {
+        'Continuous trigger by talk': b'T0',
+        'One-shot trigger by talk': b'T1',
+        'Continuous trigger by GET': b'T2',
+        'One-shot trigger by GET': b'T3',
+        'Continuous trigger by X': b'T4',
+        'One-shot trigger by X': b'T5',
+        'Continuous trigger by external trigger': b'T6',
+        'One-shot trigger by external trigger': b'T7'
+    }
+
+    srq = {
+        'Disable SRQ': b'M0',
+        'Reading overflow': b'M1',
+        'Buffer full': b'M2',
+        'Reading done': b'M8',
+        'Ready': b'M16',
+        'Error': b'M32'
+    }
+
+    eoi_and_bus_holdoff = {
+        'Enable EOI and bus holdoff_on_X': b'K0',
+        'Disable EOI Enable bus holdoff on X': b'K1',
+        'Enable EOI disable bus holdoff on X': b'K2',
+        'Disable EOI and bus holdoff on X': b'K3'
+    }
+
+    terminator = {
+        'LF CR': b'Y(LF CR)',
+        'CR LF': b'Y(CR LF)',
+        'ASCII character': b'Y(ASCII)',
+        'No terminator': b'YX'
+    }
+
+    status_word = {
+        'Send status format': b'U0',
+        'Error conditions': b'U1',
+        'Data conditions': b'U2'
+    }
 
     def __init__(self):
         self.brand = 'Keithley'
         self.model = '617'
+        self._reader = None
+        self._io_lock = threading.Lock()                  #one write/read exchange on the bus at a time
 
     def gpib_setup(self):
-        self.rm = visa.ResourceManager()
+        self.rm = get_rm()
         self.keithley617 = self.rm.open_resource('GPIB0::5')
+        self.keithley617.query_delay = 0                  #the 617 asserts EOI, no delay needed before reading
+        self.keithley617.timeout = 2000
+        self.keithley617.clear()                          #device clear - no stale reply left for the first query
+        self.keithley617.chunk_size = 1024                #a reading is ~15 bytes, one low-level read
+        self.keithley617.read_termination = '\r\n'
+        self.keithley617.write_termination = ''           #the X already executes the command string
+        self._query = self.keithley617.query
+        self.writer = CoalescingWriter(self.keithley617, self._io_lock)
                
     def start_up_auto_config(self, meter_mode):
-        if meter_mode == 'Coulombmeter':
-            fct = self.function['Coulombs']
-        elif meter_mode == 'Voltmeter':
-            fct = self.function['Volts']
-        elif meter_mode == 'Ohmmeter':
-            fct = self.function['Ohms']
-        elif meter_mode == 'Amperemeter':
-            fct = self.function['Amps']        
-        
-        meas_range = self.amps_range['Auto']
-        zr_ck_on = self.zero_check['On']
-        zr_ck_off = self.zero_check['Off']
-        zr_ct_on = self.zero_correct['Enabled']
-        zr_ct_off = self.zero_correct['Disabled']
-        bsl = self.baseline_suppression['Disabled']
-        dmd = self.display_mode['Electrometer']
-        rmd = self.reading_mode['Electrometer']
-        dst = self.data_store['Disabled']
-        dfr = self.data_format['Without prefix']
-        tmd = self.trigger_mode['One-shot trigger by X']
-        s = self.srq['Disable SRQ']
-        eoi_hd = self.eoi_and_bus_holdoff['Enable EOI and bus holdoff_on_X']
-        ttr = self.terminator['LF CR']
-        swd = self.status_word['Send status format']
-
-        string = fct + meas_range + zr_ck_off + zr_ct_off + bsl + dmd + rmd + dst + dfr + tmd + s + 'X'        
-        self.keithley617.write(string)
-        
-        '''#zero check / zero correct
-        self.keithley617.write(zr_ck_on + 'X')
-        time.sleep(1)
-        self.keithley617.write(zr_ct_on + 'X')
-        time.sleep(1)
-        self.keithley617.write(zr_ck_off + 'X')
-        time.sleep(1)
-        self.keithley617.write(meas_range + 'X')
-        '''
+        with self._io_lock:
+            self.writer.discard('R')                      #a queued range_async must not override this range
+            self.keithley617.write_raw(self._CFG[meter_mode])
         
+    def zero_correction(self, meas_range=b'R0'):
+        #zero check on, zero correct, zero check off, range - one write, each step executed on its own X
+        string = self.zero_check['On'] + b'X' + self.zero_correct['Enabled'] + b'X' + self.zero_check['Off'] + b'X' + meas_range + b'X'
+        with self._io_lock:
+            self.writer.discard('R')
+            self.keithley617.write_raw(string)
+
+    def range_async(self, meas_range):
+        #only the latest range of a burst is written, from a background thread
+        self.writer.submit('R', meas_range + b'X')
+
+    def acquire_buffer(self, n, interval='One reading per second', timeout=60000):
+        #the instrument fills its own data store (up to 100 readings), no trigger is sent per reading
+        if not 0 < n <= 100:
+            raise ValueError('the 617 data store holds 1 to 100 readings')
+        if interval == 'Trigger mode':                    #stores one reading per trigger, the one X here fills a single slot
+            raise ValueError("'Trigger mode' (Q6) needs a trigger per reading, use run() for triggered readings")
+        period = self.data_store_period.get(interval)     #None for 'Conversion rate'
+        wait_full = period is None or n == 100            #conversion rate - wait for the buffer full SRQ
+        string = (self.data_store[interval] + self.reading_mode['Buffer reading'] + self.data_format['Without prefix']
+                  + (self.srq['Buffer full'] if wait_full else b'') + b'X')
+        with self._io_lock:                               #the whole store/read-back sequence is one exchange
+            self.keithley617.write_raw(string)
+            if wait_full:
+                if period is not None:
+                    timeout = max(timeout, 100 * period * 1000 + 10000)   #ms, 100 periods plus margin
+                self.keithley617.wait_for_srq(timeout)    #raises VisaIOError on timeout
+            else:
+                time.sleep(n * period)                    #partial buffer: the readings are due after n periods
+            y = [float(self.keithley617.read()) for i in range(n)]     #each talk returns the next stored reading
+            self.keithley617.write_raw(self.reading_mode['Electrometer'] + self.data_store['Disabled'] + self.srq['Disable SRQ'] + b'X')
+
+        return y
+
     def status(self):
         pass
 
@@ -335,6 +366,20 @@ class Keithley617():
         pass
 
     def run(self):
-        y = float(self.keithley617.query('X'))     
+        if self._reader:
+            return self._reader.latest()
+        return self._read()
+
+    def _read(self):
+        with self._io_lock:
+            y = float(self._query('X'))     
         
         return y
+
+    def start_background_acquire(self, rate_hz=10):
+        #run() then returns the most recent reading instead of blocking on the bus
+        self._reader = BackgroundReader(self._read, rate_hz)
+
+    def stop_background_acquire(self):
+        self._reader.stop()
+        self._reader = None
@@ -7,7 +7,8 @@
 """
 
 import serial
-import time
+import threading
+from background_reader import BackgroundReader
 
 class KonicaMinolta():
     '''
@@ -39,67 +40,67 @@ class KonicaMinolta():
     print('chromaticityY = ', float(s[2]))         
     '''
 
-    error_check_code = dict([
-        ('OK00', 'Normal operation'),
-        ('OK11', 'Chromaticity measuring range over'),     #same as ----E0 display
-        ('OK12', 'Luminance display range over'),          #same as E9 display
-        ('OK13', 'Luminance display range under'),         #same as flickering display
-        ('ER00', 'Command error'),                         #command out of the parameter setting range
-        ('ER01', 'Setting error'),                         #same as E display
-        ('ER11', 'Memory value error'),                    #same as E1 display
-        ('ER10', 'Luminance and Chromaticity measuring range over'),     #same as E0 display
-        ('ER12', 'Luminance display range, chromaticity display range simultaneous over'),
-        ('ER20', 'EEPROM error'),                          #same as E2 display
-        ('ER30', 'Battery out')                
-        ])
+    error_check_code = {
+        'OK00': 'Normal operation',
+        'OK11': 'Chromaticity measuring range over',       #same as ----E0 display
+        'OK12': 'Luminance display range over',            #same as E9 display
+        'OK13': 'Luminance display range under',           #same as flickering display
+        'ER00': 'Command error',                           #command out of the parameter setting range
+        'ER01': 'Setting error',                           #same as E display
+        'ER11': 'Memory value error',                      #same as E1 display
+        'ER10': 'Luminance and Chromaticity measuring range over',       #same as E0 display
+        'ER12': 'Luminance display range, chromaticity display range simultaneous over',
+        'ER20': 'EEPROM error',                            #same as E2 display
+        'ER30': 'Battery out'                
+        }
 
-    calibration = dict([
-        ('PRESET', 'MDS,00\r\n'),      
-        ('VARI.','MDS,01\r\n')       
-    ])
+    calibration = {
+        'PRESET': b'MDS,00\r\n',      
+        'VARI.': b'MDS,01\r\n'       
+    }
 
-    meas_mode = dict([
-        ('ABS.', 'MDS,04\r\n'),      
-        ('DIFF.','MDS,05\r\n')       
-    ])
+    meas_mode = {
+        'ABS.': b'MDS,04\r\n',      
+        'DIFF.': b'MDS,05\r\n'       
+    }
 
-    response = dict([
-        ('FAST', 'MDS,06\r\n'),      
-        ('SLOW','MDS,07\r\n')       
-    ])    
+    response = {
+        'FAST': b'MDS,06\r\n',      
+        'SLOW': b'MDS,07\r\n'       
+    }    
     
     def __init__(self):
         self.brand = 'Konica Minolta'
         self.model = 'CS-100A'
+        self._reader = None
+        self._io_lock = threading.Lock()           #one write/read exchange on the port at a time
         
     def rs232_set_up(self, com_port):
-        self.ser = serial.Serial(timeout=10)
-        self.ser.port = com_port		
-        self.ser.baudrate = 4800
-        self.ser.bytesize = serial.SEVENBITS
-        self.ser.parity = serial.PARITY_EVEN        
-        self.ser.stopbits = serial.STOPBITS_TWO
-        self.ser.open()
+        self.ser = serial.Serial(port=com_port, baudrate=4800,
+                                 bytesize=serial.SEVENBITS,
+                                 parity=serial.PARITY_EVEN,
+                                 stopbits=serial.STOPBITS_TWO,
+                                 timeout=10, write_timeout=1)   #opens the port once, fully configured
+        self.ser.inter_byte_timeout = 0.02        #a gap inside a reply ends the read early
+        if hasattr(self.ser, 'set_buffer_size'):  #Windows only
+            self.ser.set_buffer_size(rx_size=8192, tx_size=8192)
                 
     def start_up(self, cal, color_mode, resp):
-        cal_bytes = bytes(self.calibration[cal], 'utf-8')        
-        self.ser.write(cal_bytes)
-        time.sleep(0.1)
-        cal_setng = self.ser.read(6)
+        with self._io_lock:
+            self.ser.write(self.calibration[cal])
+            cal_setng = self.ser.read_until(b'\r\n')
         cal_setng = cal_setng.decode()
         cal_setng = cal_setng[:4]
                 
-        color_mode_bytes = bytes(self.meas_mode[color_mode], 'utf-8')
-        self.ser.write(color_mode_bytes)
-        time.sleep(0.1)
-        meas_setng = self.ser.read(6)
+        with self._io_lock:
+            self.ser.write(self.meas_mode[color_mode])
+            meas_setng = self.ser.read_until(b'\r\n')
         meas_setng = meas_setng.decode()
         meas_setng = meas_setng[:4]
         
-        resp_bytes = bytes(self.response[resp], 'utf-8')
-        self.ser.write(resp_bytes)
-        time.sleep(0.1)
-        resp_setng = self.ser.read(6)
+        with self._io_lock:
+            self.ser.write(self.response[resp])
+            resp_setng = self.ser.read_until(b'\r\n')
         resp_setng = resp_setng.decode()
         resp_setng = resp_setng[:4]
         
@@ -109,21 +110,28 @@ class KonicaMinolta():
             return cal_setng, cal_setng, cal_setng
                             
     def measure(self):
-        self.ser.write(b'MES\r\n')
-        time.sleep(0.1)
-        data = self.ser.read(28)       
-        return data       
+        if self._reader:
+            return self._reader.latest()
+        return self._measure()
+
+    def _measure(self):
+        with self._io_lock:
+            self.ser.write(b'MES\r\n')
+            return self.ser.read_until(b'\r\n', size=64)   #returns as soon as the reply is complete
     
     def format_data(self, raw_data):
-        data = raw_data.split()        
-        luminance = data[1].decode()
-        L = float(luminance[:(len(luminance) - 1)])        
-        x_chromatcty = data[2].decode()
-        X = float(x_chromatcty[:(len(x_chromatcty) - 1)])
-        y_chromatcty = data[3].decode()
-        Y = float(y_chromatcty[:(len(y_chromatcty))])
+        fields = raw_data.partition(b',')[2]    #drop the OKxx/ERxx status field
+        L, X, Y = map(float, fields.split(b',')[:3])   #float() takes bytes, no decode needed
         return L, X, Y
 
+    def start_background_acquire(self, rate_hz=10):
+        #measure() then returns the most recent reading instead of blocking on the bus
+        self._reader = BackgroundReader(self._measure, rate_hz)
+
+    def stop_background_acquire(self):
+        self._reader.stop()
+        self._reader = None
+
     def rs232_close(self):
         self.ser.close() 
         
@@ -6,7 +6,10 @@
 
 """
 
-import pyvisa as visa
+from visa_rm import get_rm
+from coalescing_writer import CoalescingWriter
+from background_reader import BackgroundReader
+import threading
 
 class LakeShore():
     '''
@@ -142,43 +145,108 @@ class LakeShore():
        ZONE?     |  Output Zone Table Parameter Query       | ZONE? <output>,<zone>[term]
        ------------------------------------------------------------------------------------------------------
     '''
+
+    hrg_list = {
+        'Off': '0',
+        'Low': '1',
+        'Medium': '2',
+        'High': '3'
+    }
+
     def __init__(self):
         self.brand = 'Lakeshore'
         self.model = '335'        
+        self._reader = None
+        self._last_sp = None                                    #last values written, to skip repeats
+        self._last_hrg = None
+        self._io_lock = threading.Lock()                        #one write/read exchange on the bus at a time
         
     def gpib_set_up(self):
-        self.rm = visa.ResourceManager()
+        self.rm = get_rm()
         self.lakeshore335 = self.rm.open_resource('GPIB0::10')
+        self.lakeshore335.query_delay = 0                       #the 335 asserts EOI, no delay needed before reading
+        self.lakeshore335.timeout = 2000
+        self.lakeshore335.clear()                               #device clear - no stale reply left for the first query
         self.lakeshore335.write('*RST')        
+        self._last_sp = self._last_hrg = None                   #*RST discards the values written before
         self.lakeshore335.write_termination = '\r\n'
         self.lakeshore335.read_termination = '\r\n'
+        self.lakeshore335.chunk_size = 256                      #replies are a few bytes long
+        self.writer = CoalescingWriter(self.lakeshore335, self._io_lock)
+
+    def temperature_check(self, tolerance=0.1, timeout=600000):
+        dev, lock = self.lakeshore335, self._io_lock            #local names, looked up once
+        with lock:
+            Tsp = dev.query_ascii_values('SETP? 1', converter='f')[0]
+            T = dev.query_ascii_values('KRDG? B', converter='f')[0]
+        if abs(Tsp - T) <= tolerance:
+            return
+        if hasattr(dev, 'wait_for_srq'):                        #GPIB: let the instrument signal the setpoint
+            if T < Tsp:
+                high, low = Tsp - tolerance, 0                  #heating - alarm once above Tsp - tolerance
+            else:
+                high, low = 9999, Tsp + tolerance               #cooling - alarm once below Tsp + tolerance
+            with lock:
+                dev.write('ALMRST')
+                dev.write(f'ALARM B,1,{high},{low},0,1,0,0')
+            dev.wait_for_srq(timeout)                           #not locked, setpoints may still be written meanwhile
+            with lock:
+                dev.write('ALARM B,0,0,0,0,0,0,0')
+                dev.write('ALMRST')
+        else:
+            tol_mk = round(tolerance * 1000)                    #compare in integer millikelvin
+            Tsp_mk = int(Tsp * 1000)
+            while abs(int(T * 1000) - Tsp_mk) > tol_mk:
+                with lock:
+                    T = dev.query_ascii_values('KRDG? B', converter='f')[0]
+
+    def temperature(self):
+        if self._reader:
+            return self._reader.latest()
+        return self._temperature()
+
+    def _temperature(self):
+        with self._io_lock:
+            return self.lakeshore335.query_ascii_values('KRDG? B', converter='f')[0]
 
-    def temperature_check(self):
-        self.lakeshore335.write('SETP? 1')
-        Tsp = float(self.lakeshore335.read())
-        roundTsp = round(Tsp, 1)
-        self.lakeshore335.write('KRDG? B')
-        T = float(self.lakeshore335.read())
-        roundT = round(T, 1)
-        while abs(roundTsp - roundT) > 0.1:
-            self.lakeshore335.write('KRDG? B')
-            T = float(self.lakeshore335.read())
-            roundT = round(T) 
+    def start_background_acquire(self, rate_hz=10):
+        #temperature() then returns the most recent reading instead of blocking on the bus
+        self._reader = BackgroundReader(self._temperature, rate_hz)
+
+    def stop_background_acquire(self):
+        self._reader.stop()
+        self._reader = None
 
     def start_up(self):
-        self.lakeshore335.write('*CLS')
-        self.lakeshore335.write('INNAME A,Control')
-        self.lakeshore335.write('INNAME B,Sample')
-
-    def setpoint(self, sp):
-        sp = str(sp)
-        self.lakeshore335.write('SETP 1,' + sp)
-
-    def heater_range(self, hrg):
-        hrg_list = dict([
-            ('Off', '0'),
-            ('Low', '1'),
-            ('Medium', '2'),
-            ('High', '3')
-        ])
-        self.lakeshore335.write('RANGE 1,' + hrg_list[hrg])
+        with self._io_lock:
+            self.lakeshore335.write('*CLS')
+            self.lakeshore335.write('INNAME A,Control')
+            self.lakeshore335.write('INNAME B,Sample')
+            self.lakeshore335.write('OPSTE 1')                  #alarming bit -> operation status summary
+            self.lakeshore335.write('*SRE 128')                 #operation status summary raises SRQ
+
+    def setpoint(self, sp, force=False):
+        if sp == self._last_sp and not force:
+            return
+        #no reply expected - on GPIB the next query is serialized after this write anyway
+        with self._io_lock:
+            self.writer.discard('SETP')                         #an older async setpoint must not overwrite this one
+            self.lakeshore335.write_raw(f'SETP 1,{sp}\r\n'.encode('ascii'))
+            self._last_sp = sp                                  #only once written
+
+    def heater_range(self, hrg, force=False):
+        if hrg == self._last_hrg and not force:
+            return
+        with self._io_lock:
+            self.writer.discard('RANGE')
+            self.lakeshore335.write(f'RANGE 1,{self.hrg_list[hrg]}')
+            self._last_hrg = hrg
+
+    def setpoint_async(self, sp):
+        #only the latest setpoint of a burst is written, from a background thread
+        self._last_sp = None                                    #unknown until the writer has written it
+        self.writer.submit('SETP', f'SETP 1,{sp}\r\n'.encode('ascii'), lambda: setattr(self, '_last_sp', sp))
+
+    def heater_range_async(self, hrg):
+        self._last_hrg = None
+        self.writer.submit('RANGE', f'RANGE 1,{self.hrg_list[hrg]}\r\n'.encode('ascii'), lambda: setattr(self, '_last_hrg', hrg))
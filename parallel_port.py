@@ -6,9 +6,14 @@
 
 """
 
-from ctypes import windll
+from ctypes import windll, c_ushort
+from functools import partial
 import time
 
+_OUT32 = windll.inpout32.Out32                    #resolved once, shared by every ParallelPort
+_OUT32.argtypes = [c_ushort, c_ushort]            #void Out32(short PortAddress, short data)
+_OUT32.restype = None
+
 class ParallelPort():
     
     """Parallel Data Pins
@@ -85,8 +90,12 @@ class ParallelPort():
     import parallel_port as pp
     parallel = pp.ParallelPort(0x378)
     parallel.pin(2)
+    parallel.pulse(2, 100)
     """   
 
+    __slots__ = ('address', '_address', 'setpin_command', '_pin_map', '_low', '_high',
+                 'all_pin_low', 'all_pin_high')   #no per-instance __dict__
+
     pin_set_0x378 = [2, 3, 4, 5, 6, 7, 8, 9]   #parallel DATA pins 
     pin_set_0x37f = [1, 14, 16, 17]            #parallel CONTROL pins
     dec_0x378 = [1, 2, 4, 8, 16, 32, 64, 128]  #DECIMAL to activate the DATA pins
@@ -95,27 +104,31 @@ class ParallelPort():
     
     def __init__(self, address):
         self.address = address                        #parallel port ADDRESS
+        self._address = c_ushort(address)             #converted once, passed as is on every write
 
-        self.setpin_command = windll.inpout32.Out32     #command to activate the pin
-        
-    def all_pin_low(self):                            #set all pins LOW state
-        if self.address == 0x378:                     #if DATA pins setted
-            self.setpin_command(self.address, 0)
-        elif self.address == 0x37f:                   #if CONTROL pins setted
-            self.setpin_command(self.address, 11)
-
-    def all_pin_high(self):                           #set all pins HIGH state
-        if self.address == 0x378:                     #if DATA pins setted
-            self.setpin_command(self.address, 255)
-        elif self.address == 0x37f:                   #if CONTROL pins setted
-            self.setpin_command(self.address, 4)
+        self.setpin_command = _OUT32                  #command to activate the pin
+
+        #values are kept as c_ushort so Out32 takes them without a per-call conversion
+        if address == 0x37f:                          #if CONTROL pins setted
+            self._pin_map = {p: c_ushort(d) for p, d in zip(self.pin_set_0x37f, self.dec_0x37f)}
+            self._low, self._high = c_ushort(11), c_ushort(4)
+        else:                                         #DATA pins, also for other (offboard) addresses
+            self._pin_map = {p: c_ushort(d) for p, d in zip(self.pin_set_0x378, self.dec_0x378)}
+            self._low, self._high = c_ushort(0), c_ushort(255)
+
+        #specialized for this port at construction: calling these goes straight to Out32
+        self.all_pin_low = partial(_OUT32, self._address, self._low)     #set all pins LOW state
+        self.all_pin_high = partial(_OUT32, self._address, self._high)   #set all pins HIGH state
         
-    def pin(self, pin_number):                                 #set specific pin HIGH                                        
-        if self.address == 0x378:
-            dec_index = self.pin_set_0x378.index(pin_number )  #set DECIMAL to activate pin
-            H = self.dec_0x378[dec_index]
-            self.setpin_command(self.address, H)
-        elif self.address == 0x37f:
-            dec_index = self.pin_set_0x37f.index(pin_number )  #set DECIMAL to activate pin
-            H = self.dec_0x37f[dec_index]
-            self.setpin_command(self.address, H)               #activate pin
+    def pin(self, pin_number):                        #set specific pin HIGH
+        self.setpin_command(self._address, self._pin_map[pin_number])
+
+    def write_port(self, value):                      #write a whole byte (DECIMAL) to the port
+        self.setpin_command(self._address, value)
+
+    def pulse(self, pin_number, n=1):                 #n HIGH/LOW pulses on a pin, all pins LOW at the end
+        out, address = self.setpin_command, self._address     #bound once, not looked up per edge
+        high, low = self._pin_map[pin_number], self._low
+        for i in range(n):
+            out(address, high)
+            out(address, low)
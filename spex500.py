@@ -6,9 +6,24 @@
 
      """
 
+import numpy as np
 import pyvisa as visa
+from visa_rm import get_rm
+from concurrent.futures import Future
+import atexit
+import ctypes
+import functools
+import queue
+import sys
+import threading
 import time
 
+STEPS_PER_ANGSTROM = 4000                       #motor steps per A of wavelength
+
+@functools.lru_cache(maxsize=256)
+def move_cmd(steps):                            #F0 command per step count, built once and reused in scans
+    return b"F0,%d\r" % steps
+
 class Spex500():
     '''
     Controla o monocromador Spex 500 via porta GPIB ou RS232.
@@ -153,19 +168,47 @@ class Spex500():
     spx.start_up('rs232')
     spx.calibration(400)
     spx.run(500)
+    spx.move_relative(400)          #jog 0.1 A
+    spx.run_mA(500250)              #500.25 A given in milliangstrom, no float rounding
+
+    for steps in spx.plan_run(wavelengths):     #whole scan converted in one NumPy call
+        spx.run_steps(int(steps))
+
+    f = spx.submit('run', 600)      #returns at once, the move runs in the worker thread
+    f.result()
 
     '''   
+
+    __slots__ = ('data', 'comm_mode', 'rm', 'spex', '_pos_steps', '_io_lock', '_unread_ok',
+                 '_stop_gen', '_q', '_worker')               #no per-instance __dict__
+
+    _CMD_INIT = b"A\r"                          #fixed commands, encoded once
+    _CMD_BUSY = b"E\r"
+    _CMD_READPOS = b"H0\r"
+    _CMD_STOP = b"L\r"
+    _OK = b"oz"                                 #busy check reply when the motor is idle
     
     def __init__(self):
         self.data = ['Spex', 'model 232', 's/n 0289']        
+        self._pos_steps = None                  #cached motor position (steps), None = unknown
+        self._io_lock = threading.Lock()        #one write/read exchange on the bus at a time
+        self._unread_ok = 0                     #stop confirmations not read yet
+        self._stop_gen = 0                      #bumped by stop(), moves it interrupted do not cache a position
         
-    def set_up(self, comm_mode=str):
+    def set_up(self, comm_mode=str, address=None):
         self.comm_mode = comm_mode
-        self.rm = visa.ResourceManager()
+        self.rm = get_rm()
+        if sys.platform == 'win32':                 #1 ms timer so the busy-check sleeps are not rounded up to ~15 ms
+            winmm = ctypes.WinDLL('winmm')
+            winmm.timeBeginPeriod(1)
+            atexit.register(winmm.timeEndPeriod, 1)
         if comm_mode == 'gpib':
-            self.spex = self.rm.open_resource('GPIB0::2')
+            self.spex = self.rm.open_resource(address or 'GPIB0::2')
+            self.spex.write_termination='\r'
+            self.spex.read_termination='\r'
+            self.spex.chunk_size = 20480
         if comm_mode == 'rs232':
-            self.spex = self.rm.open_resource('ASRL3::INSTR')
+            self.spex = self.rm.open_resource(address or 'ASRL3::INSTR')
             self.spex.write_termination='\r'
             self.spex.read_termination='\r'
             self.spex.baud_rate = 19200
@@ -175,66 +218,130 @@ class Spex500():
             #self.spex.flow_control = visa.constants.VI_ATTR_ASRL_DTR_STATE
             #self.spex.constants.VI_ATTR_ASRL_DTR_STATE = True
             self.spex.timeout = 25000
+        self._q = queue.Queue()
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def submit(self, method_name, *args):
+        future = Future()
+        self._q.put((method_name, args, future))
+        return future
+
+    def _loop(self):                            #runs queued calls one at a time, off the caller's thread
+        while True:
+            method_name, args, future = self._q.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(getattr(self, method_name)(*args))
+            except Exception as e:
+                future.set_exception(e)
         
+    def _drain(self):                           #consume the "o" left behind by stop()
+        while self._unread_ok:
+            self.spex.read_bytes(1)
+            self._unread_ok -= 1
+
+    def _cmd(self, command):                    #pre-encoded command and its reply in one call
+        with self._io_lock:
+            self._drain()
+            self.spex.write_raw(command)
+            return self.spex.read()
+
+    def _cmd_fixed(self, command, size=1):      #command with a fixed-length reply, "o" by default
+        with self._io_lock:
+            self._drain()
+            self.spex.write_raw(command)
+            return self.spex.read_bytes(size)   #one read of known size, no termination scan
+
     def identity(self):        
-        self.data.append(self.spex.query("z"))                #read MAIN version number
-        self.data.append(self.spex.query("y"))                #read BOOT version number
+        self.data.append(self._cmd(b"z\r"))                   #read MAIN version number
+        self.data.append(self._cmd(b"y\r"))                   #read BOOT version number
         return self.data    
  
     def start_up(self):    
         autobaud = ""
         if self.comm_mode == 'gpib':
-            self.spex.write("222")
+            with self._io_lock:
+                self._drain()
+                self.spex.write("222")
         while autobaud != "*":
-            self.spex.write(" ")             #send WHERE AM I command
-            autobaud = self.spex.read()
-        if self.comm_mode == 'rs232':
-            self.spex.write("247")
-        respWAI = self.spex.read()       #response will be "B" for BOOT or "F" for MAIN
+            autobaud = self._cmd(b" \r")      #send WHERE AM I command
+        with self._io_lock:
+            self._drain()
+            if self.comm_mode == 'rs232':
+                self.spex.write("247")
+            respWAI = self.spex.read()       #response will be "B" for BOOT or "F" for MAIN
         if respWAI == "B":
-            self.spex.write("O2000" + "")     #send "O2000<null>" - transfer control from BOOT to MAIN program
-            self.spex.read()
-        time.sleep(0.5)        
-        self.spex.write("A")                    #initialize mono
-        self.spex.read()
+            self._cmd(b"O2000\r")             #send "O2000<null>" - transfer control from BOOT to MAIN program
+        self.spex.timeout = 250                 #short per-query timeout while MAIN is starting
+        deadline = time.monotonic() + 5
+        while True:                             #wait for MAIN to answer instead of a fixed 0.5 s
+            try:
+                if self._cmd(b" \r") == "F":
+                    break
+            except visa.errors.VisaIOError:     #no reply yet while MAIN is starting
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError('Spex500 MAIN program did not answer within 5 s')
+            time.sleep(0.05)
+        self.spex.timeout = 100000              #motor init "A" may take up to 100 s
+        self._cmd_fixed(self._CMD_INIT)         #initialize mono
         self.spex.timeout = 30000
        
     def busy_status(self):
-        status = self.spex.query("E")
-        while status != "oz":                            #while motor busy
-            status = self.spex.query("E")                #check motor status                                        
+        status = self._cmd_fixed(self._CMD_BUSY, 2)      #"o" + "q"/"z", no decode or termination scan
+        n = 0
+        while status != self._OK:                        #while motor busy
+            time.sleep(0.01 * min(2**n, 50))             #back off: 10 ms, 20 ms, ... up to 0.5 s
+            n += 1
+            status = self._cmd_fixed(self._CMD_BUSY, 2)  #check motor status
     
     def calibration(self, dsp_wavelength_A):    
-        self.spex.write("B0,1000,36000,3000")   #set motor speed
-        self.spex.read()
+        self._cmd_fixed(b"B0,1000,36000,3000\r")   #set motor speed, reply "o"
         Gwl = dsp_wavelength_A                  #wavelength (wl) A display
-        Ground = round(Gwl * 4000)              #wl to steps conversion
-        self.spex.write("G0," + str(Ground))    #setting motor position
-        self.spex.read()
+        Ground = round(Gwl * STEPS_PER_ANGSTROM)   #wl to steps conversion
+        self._cmd_fixed(b"G0,%d\r" % Ground)    #setting motor position
+        self._pos_steps = Ground
   
     def run(self, F):                           #F = target wl
-        self.spex.write("H0")                   #motor read position
-        time.sleep(0.1)
-        Houti = self.spex.read()
-        Houticond = Houti[1:len(Houti)]         #motor position without termination character
-        Hinti = int(Houticond)                  #convert to integer
-        Froundi = round(F * 4000)               #convert target wl to steps
+        self.run_steps(round(F * STEPS_PER_ANGSTROM))  #convert target wl to steps
+
+    def run_mA(self, wavelength_mA):            #target wl in integer milliangstrom, exact conversion
+        self.run_steps(wavelength_mA * STEPS_PER_ANGSTROM // 1000)
+
+    def plan_run(self, wavelengths_A):          #target steps for a whole list of wl, for run_steps
+        return np.rint(np.asarray(wavelengths_A, dtype=float) * STEPS_PER_ANGSTROM).astype(np.int64)
+
+    def run_steps(self, Froundi):               #Froundi = target position in steps
+        gen = self._stop_gen
+        Hinti = self._pos_steps                 #position left by the last move or calibration
+        self._pos_steps = None                  #unknown until this move completes
+        if Hinti is None:
+            Houti = self._cmd(self._CMD_READPOS)   #motor read position, CR already stripped
+            Hinti = int(Houti.lstrip('o'))      #drop the "o" confirmation, if present
         Fin = Froundi - Hinti                   #compute steps to run
         if Fin < 0:                             #if target wl < current wl
-            Fin = Fin - 20000                   #5nm backlash
-            self.spex.write("F0," + str(Fin))   #motor move relative
-            time.sleep(0.1)
-            self.spex.read()
-            self.busy_status()                  #motor busy check  
-            self.spex.write("F0," + str(20000)) #backlash
-            self.spex.read()
-            self.busy_status()
+            self.move_relative(Fin - 20000)     #overshoot by the 5nm backlash
+            if gen != self._stop_gen:           #stopped during the overshoot, position unknown
+                return
+            self.move_relative(20000)           #backlash - always approach from below
         else:
-            self.spex.write("F0," + str(Fin))   #if target wl > current wl
-            time.sleep(0.1)
-            self.spex.read()
-            self.busy_status()
-
-    def stop(self):
-        self.spex.write("L")
-        self.spex.read()
\ No newline at end of file
+            self.move_relative(Fin)             #if target wl > current wl
+        if gen == self._stop_gen:               #not interrupted by stop()
+            self._pos_steps = Froundi
+
+    def move_relative(self, steps):             #jog by a known step count, no H0 query or backlash
+        pos, gen = self._pos_steps, self._stop_gen
+        self._pos_steps = None                  #unknown until this move completes
+        self._cmd_fixed(move_cmd(steps))        #motor move relative
+        self.busy_status()                      #motor busy check
+        if pos is not None and gen == self._stop_gen:
+            self._pos_steps = pos + steps
+
+    def stop(self):                             #returns once "L" is written, the reply is read later
+        with self._io_lock:
+            self._stop_gen += 1                 #the move in progress must not record its target
+            self._pos_steps = None              #motion interrupted, position unknown
+            self.spex.write_raw(self._CMD_STOP)
+            self._unread_ok += 1
\ No newline at end of file
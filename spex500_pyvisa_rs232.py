@@ -7,6 +7,7 @@
 """
 
 import pyvisa as visa
+from visa_rm import get_rm
 from time import sleep
 
 class Spex500():
@@ -161,7 +162,7 @@ class Spex500():
         
     def set_up(self, comm_mode=str):
         self.comm_mode = comm_mode
-        self.rm = visa.ResourceManager()
+        self.rm = get_rm()
         self.spex = self.rm.open_resource('ASRL3::INSTR')
         self.spex.write_termination='\r'
         self.spex.read_termination='\r'
@@ -209,9 +210,7 @@ class Spex500():
         self.spex.read()
   
     def run(self, F):                           #F = target wl
-        self.spex.write("H0")                   #motor read position
-        time.sleep(0.1)
-        Houti = self.spex.read()
+        Houti = self.spex.query("H0")           #motor read position, read returns at the "\r"
         Houticond = Houti[1:len(Houti)]         #motor position without termination character
         Hinti = int(Houticond)                  #convert to integer
         Froundi = round(F * 4000)               #convert target wl to steps
@@ -219,7 +218,6 @@ class Spex500():
         if Fin < 0:                             #if target wl < current wl
             Fin = Fin - 20000                   #5nm backlash
             self.spex.write("F0," + str(Fin))   #motor move relative
-            time.sleep(0.1)
             self.spex.read()
             self.busy_status()                  #motor busy check  
             self.spex.write("F0," + str(20000)) #backlash
@@ -227,7 +225,6 @@ class Spex500():
             self.busy_status()
         else:
             self.spex.write("F0," + str(Fin))   #if target wl > current wl
-            time.sleep(0.1)
             self.spex.read()
             self.busy_status()
 
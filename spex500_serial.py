@@ -7,6 +7,7 @@
      """
 
 import serial
+import asyncio
 import time
 
 class Spex500():
@@ -154,13 +155,56 @@ class Spex500():
     spx.calibration(400)
     spx.run(500)
 
+    #asyncio - the motor slew does not block other coroutines
+    await spx.connect()
+    await asyncio.gather(spx.run_async(500), other_instrument_coroutine())
+
+    #the port is stopped and closed on exit, also when a scan is aborted
+    with spex.Spex500() as spx:
+        spx.run(500)
+
+    async with spex.Spex500() as spx:
+        await spx.run_async(500)
+
     '''   
+
+    __slots__ = ('data', 'spex', '_versions', '_pos_steps', 'reader', 'writer')   #no per-instance __dict__
+
+    _CMD_MOVE_REL = b'F0,%d\r'                  #command templates, filled with %
+    _CMD_SET_POS = b'G0,%d\r'
+    _CMD_SET_SPEED = b'B0,%d,%d,%d\r'
     
     def __init__(self):
         self.data = ['Spex', 'model 232', 's/n 0289']        
+        self._versions = None                   #MAIN/BOOT versions, read once
+        self._pos_steps = None                  #cached motor position (steps), None = unknown
         
+    def __enter__(self):                        #open, start MAIN and initialize
+        self.set_up()
+        self.start_up()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.spex.timeout = 2               #cleanup must not wait on a silent controller
+            self.stop()                         #halt the motor if a move was interrupted
+        finally:
+            self.spex.close()
+
+    async def __aenter__(self):
+        self.set_up()
+        await asyncio.to_thread(self.start_up)
+        await self.connect()                    #hands the port over to the asyncio transport
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            await asyncio.wait_for(self.stop_async(), 2)   #cleanup must not wait on a silent controller
+        finally:
+            self.close_async()
+
     def set_up(self):
-        self.spex = serial.Serial(timeout = 25000)
+        self.spex = serial.Serial(timeout = 2)           #seconds per read, a silent controller fails fast
         self.spex.port = 'COM3'
         self.spex.baudrate = 4800
         self.spex.bytesize = 8
@@ -168,65 +212,128 @@ class Spex500():
         self.spex.stopbits = 1
         self.spex.rts = False
         self.spex.dtr = True
+        self.spex.open()
+        self.low_latency()
+
+    def low_latency(self):                    #1 ms instead of 16 ms latency timer on USB-serial adapters
+        try:
+            self.spex.set_low_latency_mode(True)  #ASYNC_LOW_LATENCY, only available on POSIX
+        except (AttributeError, ValueError, OSError):
+            pass
         
+    def _cmd(self, payload, terminator=b"\r"):          #CR-terminated replies only (H0, z, y), in one read_until
+        self.spex.write(payload)
+        return self.spex.read_until(terminator)
+
+    def _cmd_fixed(self, command, size=1):               #command with a fixed-length reply, "o" by default, no CR
+        self.spex.write(command)
+        return self.spex.read(size)                      #same framing as _cmd_async
+
     def identity(self):   
-        self.spex.write(b"z\r")     
-        self.data.append(self.spex.read())                #read MAIN version number
-        self.spex.write(b"y\r")
-        self.data.append(self.spex.read())                #read BOOT version number
+        if self._versions is None:
+            self._versions = (self._cmd(b"z\r"),           #read MAIN version number
+                              self._cmd(b"y\r"))           #read BOOT version number
+            self.data.extend(self._versions)
         return self.data    
  
     def start_up(self):    
-        self.spex.write(b" \r")             #send WHERE AM I command
-        self.spex.read()
-        self.spex.write(b"247\r")           #set inteligent mode for rs232
-        respWAI = self.spex.read()       #response will be "B" for BOOT or "F" for MAIN
-        if respWAI == "B":
-            self.spex.write(b"O2000" + ""+'\r')     #send "O2000<null>" - transfer control from BOOT to MAIN program
-            self.spex.read()
+        self._cmd_fixed(b" \r")                #send WHERE AM I command
+        respWAI = self._cmd_fixed(b"247\r")    #set inteligent mode for rs232, response will be "B" for BOOT or "F" for MAIN
+        if respWAI == b"B":
+            self._cmd_fixed(b"O2000" + b"\0" + b"\r")   #send "O2000<null>" - transfer control from BOOT to MAIN program, reply "*"
         time.sleep(0.5)        
-        self.spex.write(b"A\r")                    #initialize mono
-        self.spex.read()
-        self.spex.timeout = 30000
+        self.spex.timeout = 100                 #motor init "A" may take up to 100 s
+        self._cmd_fixed(b"A\r")                #initialize mono
+        self.spex.timeout = 2
        
-    def busy_status(self):
-        self.spex.write(b"E\r")
-        status = self.spex.read()
-        while status != "oz":
-            self.spex.write(b"E\r")                            #while motor busy
-            status = self.spex.read()                #check motor status                                        
+    def busy_status(self, timeout=120):
+        delay = 0.02
+        deadline = time.monotonic() + timeout
+        status = self._cmd_fixed(b"E\r", 2)                     #"o" + "q"/"z", no CR
+        while status != b"oz":                                  #while motor busy
+            if time.monotonic() > deadline:
+                raise TimeoutError('Spex500 motor still busy after %d s' % timeout)
+            time.sleep(delay)                                   #back off, up to 250 ms between polls
+            delay = min(delay * 1.5, 0.25)
+            status = self._cmd_fixed(b"E\r", 2)                #check motor status
     
     def calibration(self, dsp_wavelength_A):    
-        self.spex.write(b"B0,1000,36000,3000\r")   #set motor speed
-        self.spex.read()
+        self._cmd_fixed(self._CMD_SET_SPEED % (1000, 36000, 3000))   #set motor speed
         Gwl = dsp_wavelength_A                  #wavelength (wl) A display
         Ground = round(Gwl * 4000)              #wl to steps conversion
-        self.spex.write(b"G0," + str(Ground)+'\r')    #setting motor position
-        self.spex.read()
+        self._cmd_fixed(self._CMD_SET_POS % Ground)   #setting motor position
+        self._pos_steps = Ground
   
     def run(self, F):                           #F = target wl
-        self.spex.write(b"H0\r")                   #motor read position
-        time.sleep(0.1)
-        Houti = self.spex.read()
-        Houticond = Houti[1:len(Houti)]         #motor position without termination character
-        Hinti = int(Houticond)                  #convert to integer
+        Hinti = self._pos_steps                 #position left by the last move or calibration
+        self._pos_steps = None                  #unknown until this move completes
+        if Hinti is None:
+            Houti = self._cmd(b"H0\r")          #motor read position
+            Hinti = int(Houti[1:].rstrip(b"\r\t "))   #drop the "o" confirmation and the CR
         Froundi = round(F * 4000)               #convert target wl to steps
         Fin = Froundi - Hinti                   #compute steps to run
         if Fin < 0:                             #if target wl < current wl
             Fin = Fin - 20000                   #5nm backlash
-            self.spex.write(b"F0," + str(Fin)+'\r')   #motor move relative
-            time.sleep(0.1)
-            self.spex.read()
+            self._cmd_fixed(self._CMD_MOVE_REL % Fin)     #motor move relative
             self.busy_status()                  #motor busy check  
-            self.spex.write(b"F0," + str(20000)+'\r') #backlash
-            self.spex.read()
+            self._cmd_fixed(self._CMD_MOVE_REL % 20000)   #backlash
             self.busy_status()
         else:
-            self.spex.write(b"F0," + str(Fin)+'\r')   #if target wl > current wl
-            time.sleep(0.1)
-            self.spex.read()
+            self._cmd_fixed(self._CMD_MOVE_REL % Fin)     #if target wl > current wl
             self.busy_status()
+        self._pos_steps = Froundi
 
     def stop(self):
-        self.spex.write(b"L")
-        self.spex.read()
\ No newline at end of file
+        self._pos_steps = None                  #motion interrupted, position unknown
+        self._cmd_fixed(b"L\r")                 #reply "o", no CR
+
+    async def connect(self):
+        try:                                    #optional, only needed for the asyncio path
+            import serial_asyncio_fast as serial_asyncio    #faster drop-in fork, same API
+        except ImportError:
+            import serial_asyncio
+        if self.spex.is_open:
+            self.spex.close()                   #the asyncio transport opens its own handle
+        self.reader, self.writer = await serial_asyncio.open_serial_connection(url='COM3', baudrate=4800, bytesize=8,
+                                                                               parity='N', stopbits=1, rtscts=False, dsrdtr=False)
+
+    async def _cmd_async(self, command, size=1):          #command with a fixed-length reply, "o" by default
+        self.writer.write(command)
+        await self.writer.drain()
+        return await asyncio.wait_for(self.reader.readexactly(size), 2)   #same 2 s as the blocking reads
+
+    async def busy_status_async(self, timeout=120):
+        delay = 0.02
+        deadline = time.monotonic() + timeout
+        while await self._cmd_async(b"E\r", 2) != b"oz":   #"o" + "q" while the motor is busy
+            if time.monotonic() > deadline:
+                raise TimeoutError('Spex500 motor still busy after %d s' % timeout)
+            await asyncio.sleep(delay)                     #other coroutines run meanwhile, back off up to 250 ms
+            delay = min(delay * 1.5, 0.25)
+
+    async def run_async(self, F):                           #F = target wl
+        Hinti = self._pos_steps                             #shared with the blocking calls
+        self._pos_steps = None
+        if Hinti is None:
+            self.writer.write(b"H0\r")                      #motor read position
+            await self.writer.drain()
+            Houti = await asyncio.wait_for(self.reader.readuntil(b"\r"), 2)   #"o" + position + CR
+            Hinti = int(Houti[1:])
+        Froundi = round(F * 4000)                           #convert target wl to steps
+        Fin = Froundi - Hinti                               #compute steps to run
+        if Fin < 0:                                         #if target wl < current wl
+            await self._cmd_async(self._CMD_MOVE_REL % (Fin - 20000))   #5nm backlash
+            await self.busy_status_async()
+            await self._cmd_async(self._CMD_MOVE_REL % 20000)
+            await self.busy_status_async()
+        else:
+            await self._cmd_async(self._CMD_MOVE_REL % Fin)
+            await self.busy_status_async()
+        self._pos_steps = Froundi
+
+    async def stop_async(self):
+        self._pos_steps = None
+        await self._cmd_async(b"L\r")
+
+    def close_async(self):
+        self.writer.close()
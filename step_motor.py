@@ -7,8 +7,11 @@
 """
 
 from parallel_port import *
+from ctypes import c_ushort
 import time
 
+SPIN_TIME = 0.001                                                 #end of each step busy-waited, sleep() jitter is ~1 ms
+
 class StepMotor(ParallelPort):
     
     """
@@ -20,6 +23,12 @@ class StepMotor(ParallelPort):
     
     One revolution is a sequence of steps_per_rev steps.
 
+    drive_mode picks the phase sequence:
+    
+    'wave' - one winding on at a time (default)
+    'full' - two adjacent windings on, more torque at the same step_time
+    'half' - alternates one and two windings, 8 states; each call counts half steps
+
     Usage
     -----
 
@@ -28,43 +37,73 @@ class StepMotor(ParallelPort):
     step = sm.StepMotor(0.005, [2, 3, 4, 5], 0x378)
 
     step.clockwise(200)
+    step.move(200, -1)                                            #same as step.counterclockwise(200)
+
+    half = sm.StepMotor(0.005, [2, 3, 4, 5], 0x378, drive_mode='half')
+    half.clockwise(400)                                           #same angle as 200 full steps
     
     """
+
+    __slots__ = ('step_time', 'parallel_pin_set', '_cw_pins', '_ccw_pins', 'drive_mode',
+                 '_phases', '_phase')                             #ParallelPort slots are inherited
        
-    def __init__(self, step_time, parallel_pin_set, parallel_address):        
+    def __init__(self, step_time, parallel_pin_set, parallel_address, drive_mode='wave'):        
         super().__init__(parallel_address)       
         self.step_time = step_time                                #set pulse_time
         self.parallel_pin_set = parallel_pin_set                  #define pins to control, ex.: [2, 3 , 4, 5]                                    
+        self._cw_pins = list(reversed(parallel_pin_set))          #reversed once, not on every call
+        self._ccw_pins = list(parallel_pin_set)
+        self.drive_mode = drive_mode
+        self._phases = self._sequence(drive_mode)                 #port byte for each phase, counterclockwise order
+        self._phase = 0                                           #index of the phase last energized
+
+    def _sequence(self, drive_mode):
+        #phases are combined as active bits and XORed back with the all-LOW byte, since some
+        #CONTROL pins are inverted; for DATA pins the all-LOW byte is 0 and this is a plain OR
+        base = self._low.value
+        a, b, c, d = [self._pin_map[p].value ^ base for p in self._ccw_pins]
+        if drive_mode == 'wave':
+            seq = [a, b, c, d]
+        elif drive_mode == 'full':
+            seq = [a | b, b | c, c | d, d | a]
+        elif drive_mode == 'half':
+            seq = [a, a | b, b, b | c, c, c | d, d, d | a]
+        else:
+            raise ValueError("drive_mode must be 'wave', 'full' or 'half'")
+        return [c_ushort(m ^ base) for m in seq]
+
     def step(self, i):                                            #define one pulse
         super().pin(i)                                            #set pin i HIGH
         time.sleep(self.step_time)                                #pulse time   
                 
-    def clockwise(self, number_of_steps):                         #execute one step clockwise direction  
-        step_number = 0
-        reverse_pin_set = list(reversed(self.parallel_pin_set))   #reverse the pin set
-        reverse_pin_index = 0
-        pin = reverse_pin_set[reverse_pin_index]
-        while step_number < number_of_steps:
-            self.step(pin)
-            step_number += 1
-            reverse_pin_index += 1            
-            if reverse_pin_index <= 3:
-                pin = reverse_pin_set[reverse_pin_index]
-            else:
-                reverse_pin_index = 0
-                pin = reverse_pin_set[reverse_pin_index]
+    def clockwise(self, number_of_steps):                         #execute steps clockwise direction  
+        self.move(number_of_steps, +1)
                 
-    def counterclockwise(self, number_of_steps):                #execute one step counterclockwise direction
-        step_number = 0
-        pin_set = self.parallel_pin_set                         #pin set
-        pin_index = 0
-        pin = pin_set[pin_index]
-        while step_number < number_of_steps:
-            self.step(pin)
-            step_number += 1
-            pin_index += 1            
-            if pin_index <= 3:
-                pin = pin_set[pin_index]
-            else:
-                pin_index = 0
-                pin = pin_set[pin_index]         
+    def counterclockwise(self, number_of_steps):                  #execute steps counterclockwise direction
+        self.move(number_of_steps, -1)
+
+    anticlockwise = counterclockwise                              #alias, older scripts call anticlockwise
+
+    def move(self, number_of_steps, direction=+1):                #direction > 0 clockwise, otherwise counterclockwise
+        #steps are scheduled on absolute deadlines, so the time spent writing the port is absorbed
+        #by the sleep instead of adding to every step
+        #each move continues from the phase the last one left energized, so moves that are not
+        #a multiple of the phase count do not lose steps
+        phases, phase = self._phases, self._phase
+        inc = -1 if direction > 0 else 1                          #clockwise runs the table backwards
+        out, address = self.setpin_command, self._address         #bound once, not looked up per step
+        step_time, last = self.step_time, len(phases) - 1        #4 or 8 phases, a power of two
+        clock, sleep = time.perf_counter, time.sleep
+        next_t = clock()
+        try:
+            for _ in range(round(number_of_steps)):               #ThermoJarrellAsh passes float step counts
+                phase = (phase + inc) & last
+                out(address, phases[phase])                       #one whole-port write per step
+                next_t += step_time
+                delay = next_t - clock() - SPIN_TIME
+                if delay > 0:
+                    sleep(delay)                                  #coarse wait, leaves the CPU free
+                while clock() < next_t:                           #spin the last SPIN_TIME for a sharp edge
+                    pass
+        finally:
+            self._phase = phase                                   #also kept if the move is interrupted
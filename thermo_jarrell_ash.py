@@ -6,8 +6,38 @@
 
 """
 
+import numpy as np
 import step_motor as sm
-import time
+import asyncio
+
+_CONFIGS = {                                                      #monochromator tables by serial number
+    6902: {
+        'brand': 'Thermo Jarrell Ash',
+        'date': '9/4/90',
+        'model': '82-415a',
+        's/n': '6902',
+        'step factor': 24,
+        'pin sequence': [6, 7, 8, 9],
+        'pulse width': 0.004,
+        'step motor': 'MAE HY 200',
+        'phases': '4',
+        'current/phase': '1 A / phase',
+        'steps per revolution': '200 steps/rev'
+    },
+    34575: {
+        'brand': 'Thermo Jarrell Ash',
+        'date': '',
+        'model': '82-020',
+        's/n': '34575',
+        'step factor': 120,
+        'pin sequence': [3, 2, 4, 5],
+        'pulse width': 0.004,
+        'step motor': 'MAE HY 200',
+        'phases': '4',
+        'current/phase': '1 A / phase',
+        'steps per revolution': '200 steps/rev'
+    }
+}
 
 class ThermoJarrellAsh():
 
@@ -19,68 +49,49 @@ class ThermoJarrellAsh():
 
     ext_mono = ThermoJarrellAsh(34575)
     ext_mono.start_up(600, 600.05)    
+    ext_mono.scan([600.05, 600.10, 600.15], at_point=print)
+
+    Async usage, moving together with a Spex500 on another bus (spex500_serial):
+
+    await spx.connect()
+    await asyncio.gather(spx.run_async(500), ext_mono.step_forward_async(1))
 
     '''
 
-    sn_6902 = dict([
-        ('brand', 'Thermo Jarrell Ash'), 
-        ('date', '9/4/90'),
-        ('model', '82-415a'),
-        ('s/n', '6902'),
-        ('step factor', 24),
-        ('pin sequence', [6, 7, 8, 9]),
-        ('pulse width', 0.004),
-        ('step motor', 'MAE HY 200'),
-        ('phases', '4'),
-        ('current/phase', '1 A / phase'),
-        ('steps per revolution', '200 steps/rev')
-    ])
-
-    sn_34575 = dict([
-        ('brand', 'Thermo Jarrell Ash'), 
-        ('date', ''),
-        ('model', '82-020'),
-        ('s/n', '34575'),
-        ('step factor', 120),
-        ('pin sequence', [3, 2, 4, 5]),
-        ('pulse width', 0.004),
-        ('step motor', 'MAE HY 200'),
-        ('phases', '4'),
-        ('current/phase', '1 A / phase'),
-        ('steps per revolution', '200 steps/rev')
-    ])    
+    __slots__ = ('serial_number', 'step_factor', 'excitation_motor', '_backlash_steps')
+
+    sn_6902 = _CONFIGS[6902]                                      #kept for scripts reading the tables
+    sn_34575 = _CONFIGS[34575]
     
     def __init__(self, serial_number):
         self.serial_number = serial_number
+        self.setup_step_motor()                                   #motor ready once the object exists
           
     def setup_step_motor(self):
-        if self.serial_number == 6902:
-            self.step_factor = self.sn_6902['step factor']
-            self.excitation_motor = sm.StepMotor(self.sn_6902['pulse width'], self.sn_6902['pin sequence'], 0x378)
-        elif self.serial_number == 34575:
-            self.step_factor = self.sn_34575['step factor']
-            self.excitation_motor = sm.StepMotor(self.sn_34575['pulse width'], self.sn_34575['pin sequence'], 0x378)
+        cfg = _CONFIGS[self.serial_number]                        #KeyError for an unknown serial number
+        self.step_factor = cfg['step factor']
+        self._backlash_steps = 5 * self.step_factor               #backlash = 5 steps, computed once
+        self.excitation_motor = sm.StepMotor(cfg['pulse width'], cfg['pin sequence'], 0x378)
 
     def calibration(self, display_wl, target_wl):
         cal = (target_wl - display_wl) * self.step_factor
         if cal < 0:
-            self.excitation_motor.anticlockwise(abs(cal))
-            self.backlash()
+            self.excitation_motor.move(abs(cal) + self._backlash_steps, -1)   #over-travel by the backlash and return
+            self.excitation_motor.move(self._backlash_steps, +1)
         elif cal > 0:
             self.excitation_motor.clockwise(cal)
         elif cal == 0:
             pass
 
     def backlash(self):
-        backsteps = 5 * self.step_factor                          #backlash = 5 steps                        
-        self.excitation_motor.anticlockwise(backsteps)
-        self.excitation_motor.clockwise(backsteps)
+        self.excitation_motor.move(self._backlash_steps, -1)
+        self.excitation_motor.move(self._backlash_steps, +1)
             
     def start_up(self, display_wl, spectral_start):
         start = (spectral_start - display_wl) * self.step_factor
         if start < 0:
-            self.excitation_motor.anticlockwise(abs(start))
-            self.backlash()
+            self.excitation_motor.move(abs(start) + self._backlash_steps, -1)   #over-travel by the backlash and return
+            self.excitation_motor.move(self._backlash_steps, +1)
         elif start > 0:
             self.excitation_motor.clockwise(start)
         elif start == 0:
@@ -92,6 +103,31 @@ class ThermoJarrellAsh():
 
     def step_backward(self, spectral_step):
         step = spectral_step * self.step_factor
-        self.excitation_motor.anticlockwise(step)
-        self.backlash()
-        
+        self.excitation_motor.move(step + self._backlash_steps, -1)   #over-travel by the backlash and return
+        self.excitation_motor.move(self._backlash_steps, +1)
+
+    async def step_forward_async(self, spectral_step):
+        #the parallel port stepping loop runs in a worker thread, so other instruments
+        #can be driven from the event loop meanwhile
+        await asyncio.to_thread(self.step_forward, spectral_step)
+
+    async def step_backward_async(self, spectral_step):
+        await asyncio.to_thread(self.step_backward, spectral_step)
+
+    def scan(self, wavelengths, at_point=None):
+        #moves through wavelengths starting at wavelengths[0] (current position, e.g. after start_up);
+        #step positions are rounded once for the whole list, so rounding does not add up along the scan
+        positions = np.rint(np.asarray(wavelengths, dtype=float) * self.step_factor).astype(np.int64)
+        deltas = np.diff(positions).tolist()
+        backsteps = self._backlash_steps
+        motor = self.excitation_motor
+        if at_point is not None:
+            at_point(wavelengths[0])
+        for wl, d in zip(wavelengths[1:], deltas):
+            if d > 0:
+                motor.move(d, +1)
+            elif d < 0:                                           #only backward moves pay the backlash
+                motor.move(-d + backsteps, -1)
+                motor.move(backsteps, +1)
+            if at_point is not None:
+                at_point(wl)                                      #e.g. acquire a point at wl
@@ -0,0 +1,26 @@
+# encoding: utf-8
+
+""" 
+    Author: Marcelo Meira Faleiros
+    State University of Campinas, Brazil
+
+"""
+
+import pyvisa as visa
+import functools
+import atexit
+
+@functools.lru_cache(maxsize=1)
+def get_rm():
+    '''
+    Single pyvisa ResourceManager shared by all drivers, created on first use
+    and closed when the interpreter exits.
+
+    Usage
+    -----
+    from visa_rm import get_rm
+    rm = get_rm()
+    '''
+    rm = visa.ResourceManager()
+    atexit.register(rm.close)
+    return rm